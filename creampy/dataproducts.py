@@ -9,11 +9,25 @@ Pressure(ERA5):ERA5 data on 37 pressure levels (1000 hpa to 1 hpa) from ECMWF
 
 """
 
+import asyncio
 import cdsapi
+import functools
+import hashlib
+import json
 import os
-import datetime
+import pathlib
+import threading
+import time
 import numpy as np
+import pandas as pd
 import xarray
+import requests
+from contextlib import closing
+import shutil
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
 # import modules from the cream package
@@ -21,6 +35,52 @@ from creampy import plotting
 from creampy import utils
 
 
+# all months, days, hours and pressure levels which are available for ERA5, formatted as documented for the CDS API
+_MONTHS = [f'{i:02d}' for i in range(1, 13)]
+_DAYS = [f'{i:02d}' for i in range(1, 32)]
+_HOURS = [f'{i:02d}:00' for i in range(24)]
+_PRESSURE_LEVELS = ['1', '2', '3','5', '7', '10','20', '30', '50','70', '100', '125','150', '175', '200','225', '250', '300','350', '400', '450','500', '550', '600','650', '700', '750','775', '800', '825','850', '875', '900','925', '950', '975','1000']
+
+
+def _request_hash(dataset, request):
+    """Computes a short hash of an API request, which identifies the downloaded data independent of the order of the request keywords.
+
+    Parameter:
+    ----------
+
+    dataset(str): name of the ERA5 data product on the Copernicus server
+    request(dict): API request
+
+    Returns:
+    --------
+
+    key(str): first 16 hex digits of the SHA1 hash of the request
+    """
+    canonical = json.dumps({'dataset': dataset, 'request': request}, sort_keys = True)
+    return hashlib.sha1(canonical.encode()).hexdigest()[:16]
+
+
+def _sort_key(request):
+    """Returns the first timestep of an API request, by which the downloaded files are sorted in time.
+
+    Parameter:
+    ----------
+
+    request(dict): API request
+
+    Returns:
+    --------
+
+    key(str): first timestep as 'YYYY-MM-DD HH:00'
+    """
+    def first(name, default):
+        values = request.get(name, default)
+        if isinstance(values, str):
+            values = [values]
+        return min(int(str(v).split(':')[0]) for v in values)
+
+    return f"{first('year', '0'):04d}-{first('month', '1'):02d}-{first('day', '1'):02d} {first('time', '0'):02d}:00"
+
 
 class ERA5():
     """
@@ -31,30 +91,72 @@ class ERA5():
     -----------
     product(str): supported products are land, single-level, pressure-level
     resolution(str): hourly or monthly
-    variables(list): list with ERA5 variable(s) (check https://confluence.ecmwf.int/display/CKB/ERA5%3A+data+documentation for all available variables)
-    domain(list): list with strings to select region  [lat2,lon1,lat1,lon2], if None: global data is downloaded
+    variables(list or str): list with ERA5 variable(s) or name of a single variable (check https://confluence.ecmwf.int/display/CKB/ERA5%3A+data+documentation for all available variables)
+    domain(list): list with strings to select region  [north, west, south, east], which is cut out on the Copernicus server before the download
+    global_data(bool): has to be True to download global data without a domain (the default is False, to avoid accidentally downloading the full global grid)
+    area(list): domain as float list [north, west, south, east] for the API request, None for global data
     path(str): name of directory where data download is stored: cache/
     files(list): list with file paths, once the data for a specific data product and subsetting is has been downloaded 
+    max_workers(int): maximum number of API requests which are processed in parallel (the Copernicus server only runs a few requests per user at the same time)
+    retries(int): number of attempts for each API request before the download is aborted
+    poll_interval(float): seconds to wait between checking the state of submitted API requests
+    chunk_size(int): number of bytes which are read and written at once during the download
+    download_format(str): 'netcdf' or 'grib'. The Copernicus server accepts much larger GRIB requests, since netCDF files are converted on the server. GRIB files are converted to netCDF after the download (requires cfgrib).
+    keep_grib(bool): if True, downloaded GRIB files are kept next to the converted netCDF files
+    split_variables(bool): if True, files with several variables are split into one file per variable after the download (file name + '_' + short name of variable). All variables are still requested with a single API request, which is processed faster than one request per variable.
+    convert_to_zarr(bool): if True, downloaded files are converted to chunked and compressed Zarr stores, from which single timesteps are read without scanning the whole file (requires zarr). The netCDF files are removed after the conversion.
+    use_cache(bool): if True, requests are not sent again when their data is in the cache. The files are named by a hash of the API request and recorded in the SQLite manifest cache/manifest.sqlite. Files which were removed from the cache by hand are removed from the manifest by get_files(), so that they are downloaded again.
     """
 
-    def __init__(self, product, variables, resolution, domain= None):
+    # cdsapi clients are not thread-safe, so each download thread opens its own client
+    _local = threading.local()
+
+    max_workers = 3
+    retries = 3
+    poll_interval = 2
+    chunk_size = 4 * 1024 * 1024
+    download_format = 'netcdf'
+    keep_grib = False
+    split_variables = False
+    convert_to_zarr = False
+    use_cache = True
+
+    def __init__(self, product, variables, resolution, domain= None, global_data = False):
         self.product = product
         self.resolution = resolution 
+        # a single variable name is stored as a list, so that requests and cached files do not depend on how the variable was passed
+        if isinstance(variables, str):
+            variables = [variables]
         self.variables = variables
-        if domain == None:
-            self.domain= ""
+
+        if domain is None:
+            if not global_data:
+                raise ValueError('no domain given: select a region with domain = [north, west, south, east] or set global_data = True to download global data')
+            self.domain = []
+            self.area = None
         else:
-            self.domain = domain
+            if len(domain) != 4:
+                raise ValueError('domain has to contain four values: [north, west, south, east]')
+            north, west, south, east = [float(x) for x in domain]
+            if not -90 <= south < north <= 90:
+                raise ValueError('invalid domain ' + str(domain) + ': latitudes have to be ordered [north, west, south, east]')
+            self.domain = [str(x) for x in domain]
+            self.area = [north, west, south, east]
+
+        # request keywords which are the same for all requests of this data product, the area keyword is omitted for global data
+        self._base_request = {"variable": self.variables}
+        if self.area is not None:
+            self._base_request["area"] = self.area
 
         # create output directory to store data downloads, if it does not already exist
-        self.path = 'cache'
-        if os.path.isdir(self.path) ==  False :
-            os.mkdir(self.path)
+        self.path = pathlib.Path('cache')
+        self.path.mkdir(parents = True, exist_ok = True)
+        self._create_manifest()
 
         self.files = [] 
 
-    def get_data_per_year(self, years, months = None, days = None, hours = None, pressure_levels= None):
-        """Downloads ERA5 data for a specific year or multiple years at hourly or monthly resolution. The output data is stored seperately for each year.
+    def get_data_per_year(self, years, months = None, days = None, hours = None, pressure_levels= None, chunk = None):
+        """Downloads ERA5 data for a specific year or multiple years at hourly or monthly resolution. The output data is stored seperately for each month (hourly data) or for each year (monthly means).
 
         Parameter:
         ----------
@@ -67,152 +169,134 @@ class ERA5():
         months(list): string list with months, if None: all months are downloaded
         days(list): string list with days, if None: all days are downloaded
         hours(list): string list with hours, if None: all hours are downloaded for hourly data and monthly means 
+        chunk(str): 'month' or 'year' to send one API request for each month or for each year. If None: hourly data is requested per month, since the Copernicus server rejects too large requests, and monthly means per year.
+        """
+        # send API requests for data download
+        self._submit_all(self._jobs_per_year(years, months, days, hours, pressure_levels, chunk))
+
+
+    async def get_data_per_year_async(self, years, months = None, days = None, hours = None, pressure_levels= None, chunk = None, max_in_flight = None):
+        """Downloads ERA5 data like get_data_per_year as a coroutine, which can be awaited in a running event loop (e.g. in a Jupyter notebook: await era5.get_data_per_year_async(['2000'])) together with other downloads. A semaphore bounds the number of requests queued on the Copernicus server at the same time, and each request is submitted, polled and downloaded with the cdsapi client in a worker thread.
+
+        Parameter:
+        ----------
+
+        years(list): string list with year(s) to download at hourly or monthly resolution
+
+        optional:
+        ----------
+
+        months, days, hours, pressure_levels, chunk: see get_data_per_year
+        max_in_flight(int): maximum number of requests queued on the Copernicus server at the same time. If None: max_workers
         """
+        if max_in_flight is None:
+            max_in_flight = self.max_workers
+
+        jobs = self._jobs_per_year(years, months, days, hours, pressure_levels, chunk)
+        await self._submit_all_async(jobs, max_in_flight)
+
 
-        # open new client instance
-        c = cdsapi.Client()
+    def _jobs_per_year(self, years, months, days, hours, pressure_levels, chunk):
+        """Returns the API requests for get_data_per_year, which are not in the cache yet.
 
+        Returns:
+        --------
+
+        jobs(list): list with tuples (dataset, request, filepath) for each file to download
+        """
         # check with data product to download 
         if self.resolution == 'monthly':
             downloadkey = self.product + '-monthly-means'
-            if hours == None:
+            if hours is None:
                 producttype= 'monthly_averaged_reanalysis'
         else:
             producttype= 'reanalysis'
             downloadkey = self.product
 
         # select all months, days and hours if not specifies
-        if months == None:
-            months=   list(np.arange(1,13).astype(str))
-            m = ''
-        else:
-            # string for file name
-            m= '_months' + ''.join(months)
-
-        if days == None:
-            days =  list(np.arange(1,32).astype(str))
-            d= ''
+        if months is None:
+            months = _MONTHS
+        if days is None:
+            days = _DAYS
+        if hours is None:
+            hours = _HOURS
+
+        if pressure_levels == 'all':
+            pressure_levels = _PRESSURE_LEVELS
+
+        if chunk is None:
+            chunk = 'year' if self.resolution == 'monthly' else 'month'
+        if chunk not in ('month', 'year'):
+            raise ValueError('invalid chunk ' + str(chunk) + ': choose month or year')
+
+        # one file with all months of a year, or one file for each month
+        if chunk == 'year':
+            chunks = [(year, months) for year in years]
         else:
-            # string for file name
-             d= '_days' + ''.join(months)
+            chunks = [(year, [month]) for year in years for month in months]
 
-        if hours == None:
-            hours = list(np.arange(0,24).astype(str))
-            h= ''
-        else:
-            # string for filename
-            h = '_hours' + ''.join(months)
-
-        # download data for each year
-        for year in years:
-            filename= 'era5_'+ downloadkey +'_'+ year + m + d + h + '_' +''.join(self.variables) + '_' + ','.join(self.domain)+   '.nc'
-            filepath = os.path.join(self.path, filename)
+        # collect API requests for each year or month
+        api_requests = []
+        for year, chunk_months in chunks:
+            request = self._request(product_type = producttype, year = year, month = chunk_months, day = days, time = hours)
+            if pressure_levels is not None:
+                request["pressure_level"] = pressure_levels
 
-            # check whether file already has been downloaded
-            if os.path.exists(filepath) == True:
-                print('omittted download for ', filename)
+            api_requests.append(('reanalysis-era5-'+ downloadkey, request))
 
-            else:
-                if pressure_levels== None:
-                    # send API request for data download
-                    c.retrieve('reanalysis-era5-'+ downloadkey , {
-                        "product_type":   producttype,
-                        "format":         "netcdf",
-                        "area":           '/'.join(self.domain), 
-                        "variable":       self.variables,
-                        "year":           year,
-                        "month":          months,
-                        "day":           days,
-                        "time":          hours
-                    }, filepath)
-
-                    print('file downloaded and saved as ', filepath)
-                    self.files.append(filepath)
-
-
-                elif pressure_levels == 'all':
-                    # send API request for data download
-                    c.retrieve('reanalysis-era5-'+ downloadkey , {
-                        "product_type":   producttype,
-                        "format":         "netcdf",
-                        "area":           '/'.join(self.domain), 
-                        "variable":       self.variables,
-                        "pressure_level": ['1', '2', '3','5', '7', '10','20', '30', '50','70', '100', '125','150', '175', '200','225', '250', '300','350', '400', '450','500', '550', '600','650', '700', '750','775', '800', '825','850', '875', '900','925', '950', '975','1000',],
-                        "year":           year,
-                        "month":          months,
-                        "day":           days,
-                        "time":          hours
-                    }, filepath)
-
-                    print('file downloaded and saved as ', filepath)
-                    self.files.append(filepath)
-
-                else:
-                    # send API request for data download
-                    c.retrieve('reanalysis-era5-'+ downloadkey , {
-                        "product_type":   producttype,
-                        "format":         "netcdf",
-                        "area":           '/'.join(self.domain), 
-                        "variable":       self.variables,
-                        "pressure_level": pressure_levels,
-                        "year":           year,
-                        "month":          months,
-                        "day":           days,
-                        "time":          hours
-                    }, filepath)
+        jobs, filepaths = self._plan(api_requests)
+        return jobs
 
-                    print('file downloaded and saved as ', filepath)
-                    self.files.append(filepath)
 
 
 
-
-    def get_data_for_composites(self, composites):
-        """Downloads ERA5 data for hourly (non-consecutive) timesteps, where each timestep is saved as a separate file. Since the timesteps do not need to be consecutive, the function enables the download for climate composites.
+    def get_data_for_composites(self, composites, out = None):
+        """Downloads ERA5 data for hourly (non-consecutive) timesteps. Since the timesteps do not need to be consecutive, the function enables the download for climate composites. Timesteps on the same day are downloaded with a single request and saved in one file.
 
         Parameter:
         ----------
 
         composites: list with timesteps asy,  dateime format (containing year, month, day, hour for each timestep)
 
+        optional:
+        ----------
+
+        out(str): name of a netCDF file in the cache directory, in which all timesteps are merged. The files for the single days are removed after merging, so that the composite can be opened as one file.
+
         """
-        # open new client instance
-        c = cdsapi.Client()
+        # group timesteps by day
+        timesteps = {}
+        for t in composites:
+            timesteps.setdefault((str(t.year), f'{t.month:02d}', f'{t.day:02d}'), set()).add(t.hour)
 
-        for i in np.arange(0,len(composites)):
-            year= str(composites[i].year)
-            month= str(composites[i].month)
-            day= str(composites[i].day)
-            hour= str(composites[i].hour)
+        if out is not None and os.path.exists(os.path.join(self.path, out)):
+            print('omittted download for ', out)
+            return
+        if out is not None and self.split_variables:
+            raise ValueError('composites can only be merged into one file, if split_variables is False')
 
-            filename = 'era5_'+ self.product+'_'+ year + month + day + hour+'_' + ''.join(self.variables) +  '_' + ','.join(self.domain)+  '.nc'
-            filepath = os.path.join(self.path, filename)
+        dataset = 'reanalysis-era5-' + self.product
 
-            # check whether file already has been downloaded
-            if os.path.exists(filepath) == True:
-                print('omittted download for ', filename)
+        api_requests = []
+        for (year, month, day), hours in timesteps.items():
+            hours = [f'{hour:02d}:00' for hour in sorted(hours)]
+            api_requests.append(self._request(product_type = "reanalysis", year = [year], month = [month], day = [day], time = hours))
 
-            else:
-                # Send request (download data)
-                c.retrieve('reanalysis-era5-'+self.product, {
-                    "product_type":   "reanalysis",
-                    "format":         "netcdf",
-                    "area":            '/'.join(self.domain),
-                    "variable":       self.variables,
-                    "year":           [year],
-                    "month":          [month],
-                    "day":            [day],
-                    "time":           [hour]
-                }, filepath)
+        jobs, filepaths = self._plan([(dataset, request) for request in api_requests])
+
+        # Send requests (download data)
+        results = self._submit_all(jobs)
 
-                print('file downloaded and saved as', filepath)
-                self.files.append(filepath)
+        if out is not None:
+            # downloaded files can be stored under a different path than requested (converted Zarr stores)
+            downloaded = {filepath: files[0] for (dataset, request, filepath), files in zip(jobs, results)}
+            self._merge(dataset, api_requests, [downloaded.get(f, f) for f in filepaths], out)
 
 
 
 
     def get_data_for_range(self,start, end):
-        """Download ERA5 for a given range.
+        """Download ERA5 for a given range. Hourly data is downloaded with one request per month. Since the Copernicus server returns all hours for each requested day, the first and last file can contain timesteps outside of the range, which can be removed with xarray: ds.sel(time = slice(start, end)).
 
         Parameter:
         ----------
@@ -222,108 +306,565 @@ class ERA5():
 
         """
 
-        # open new client instance
-        c = cdsapi.Client()
-
-        import itertools
+        api_requests = []
         if self.resolution == 'monthly':
 
             downloadkey = self.product + '-monthly-means'
 
-            if start.year != end.year:
+            # all months between start and end, including the months of both dates
+            periods = pd.period_range(start.strftime('%Y-%m'), end.strftime('%Y-%m'), freq = 'M')
 
-                # get years with complete nr. of months 
-                full_years_range = range(start.year + 1 , end.year)
-                full_years = list(itertools.chain.from_iterable(itertools.repeat(x, 12) for x in full_years_range))
-                all_months = np.arange(1,13).astype(str)
+            for year, month in [(str(p.year), f'{p.month:02d}') for p in periods]:
+                # API request for specific year and month 
+                request = self._request(product_type = "monthly_averaged_reanalysis", year = [year], month = [month], time = ['00:00'])
+                api_requests.append(('reanalysis-era5-'+downloadkey, request))
 
-                # get months of uncomplete years 
-                months_first_year = list(np.arange((start.month + 1),13 ).astype(str))
-                months_last_year =  list(np.arange(1, (end.month+1)).astype(str))
+        else:
+            # get all hourly timesteps between two dates
+            dates = pd.date_range(start, end, freq = 'h')
 
-                # create lists for years with months
-                years = [str(start.year)] * len(months_first_year) +  [str(f) for f in full_years]   +  [str(end.year)] * len(months_last_year) 
-                months = months_first_year +  [str(m) for m in all_months ]  * len(full_years_range) +  months_last_year
+            # send one request for all timesteps in the same month
+            for (year, month), group in pd.Series(dates).groupby([dates.year, dates.month]):
+                days = sorted(set(group.dt.strftime('%d')))
+                hours = sorted(set(group.dt.strftime('%H:%M')))
 
+                # API request for specific year and month 
+                request = self._request(product_type = "reanalysis", year = [str(year)], month = [f'{month:02d}'], day = days, time = hours)
+                api_requests.append(('reanalysis-era5-'+ self.product, request))
+
+        # send API requests for data download
+        jobs, filepaths = self._plan(api_requests)
+        self._submit_all(jobs)
+
+
+
+    def _merge(self, dataset, api_requests, filepaths, out):
+        """Merges several downloaded files along the time dimension into a single netCDF file and removes the original files. The merged file replaces the original files in the manifest.
+
+        Parameter:
+        ----------
+
+        dataset(str): name of the ERA5 data product on the Copernicus server
+        api_requests(list): API requests of the files to merge
+        filepaths(list): paths of files to merge
+        out(str): name of merged file in the cache directory
+        """
+        outpath = os.path.join(self.path, out)
+
+        # the merged file is written to a temporary file first, so that an interrupted merge is never mistaken for a cached file
+        datasets = [xarray.open_dataset(filepath) for filepath in filepaths]
+        merged = xarray.concat(datasets, dim = 'time').sortby('time')
+        merged.to_netcdf(outpath + '.part')
+        for ds in datasets:
+            ds.close()
+        os.replace(outpath + '.part', outpath)
+
+        for filepath in filepaths:
+            if os.path.isdir(filepath):
+                shutil.rmtree(filepath)
             else:
-                months = np.arange(start.month, end.month + 1 ).astype(str)
-                nr_of_months = np.shape(months)[0]
-                years = [str(start.year)] * nr_of_months
+                os.remove(filepath)
 
+        # removed files are no longer part of the cache, the merged file is recorded for all requests together
+        self._forget([_request_hash(dataset, request) for request in api_requests])
+        self._record(dataset, {'composite': api_requests}, [outpath], sortkey = min(_sort_key(request) for request in api_requests))
 
+        self.files = [f for f in self.files if f not in filepaths] + [outpath]
+        print('files merged and saved as ', outpath)
 
-            for idx,month in enumerate(months):
-                year = years[idx]
-                filename = 'era5_'+ downloadkey +'_'+ year +  month +'_' + ''.join(self.variables) + '_' + ','.join(self.domain)+ '.nc'
-                filepath = os.path.join(self.path, filename)
 
-                # check whether file already has been downloaded
-                if os.path.exists(filepath) == True:
-                    print('omittted download for ', filename)
+    def _plan(self, api_requests):
+        """Selects the API requests, whose data is not in the cache yet. The files are named by a hash of the request, so that the same request always maps to the same file. All requests are looked up by their hash in the manifest with a single query, so that the cache directory is not scanned. Only the recorded files of cached requests are checked, requests whose files have been removed are dropped from the manifest and downloaded again.
 
-                else:
-                        # API request for specific year and month 
-                        c.retrieve('reanalysis-era5-'+downloadkey, {
-                            "product_type":   "monthly_averaged_reanalysis",
-                            "format":         "netcdf",
-                            "area":            '/'.join(self.domain),
-                            "variable":       self.variables,
-                            "year":           [year],
-                            "month":          [month],
-                            "time":            ['00:00'],
-                        }, filepath)
-
-                        print('file downloaded and saved as', filepath)
-                        self.files.append(filepath)
+        Parameter:
+        ----------
 
-        else:
-            # get list with all years, months, days, hours between two dates
-            delta =(end - start)
-            hour = delta/3600
-            dates = []
-            for i in range(hour.seconds + 1):
-                h = start + datetime.timedelta(hours=i)
-                dates.append(h)
-
-            for idx,date in enumerate(dates):
-                year = str(dates[idx].year)
-                month = str(dates[idx].month)
-                day = str(dates[idx].day)
-                hour= str(dates[idx].hour) 
-
-                filename = 'era5_'+ self.product +'_'+ year +  month + day+ hour+ '_' + ''.join(self.variables) + '_' + ','.join(self.domain) +  '.nc'
-                filepath = os.path.join(self.path, filename)
-
-                # check whether file already has been downloaded
-                if os.path.exists(filepath) == True:
-                    print('omittted download for ', filename)
+        api_requests(list): list with tuples (dataset, request)
+
+        Returns:
+        --------
+
+        jobs(list): list with tuples (dataset, request, filepath) for each file to download
+        filepaths(list): path of output file for each request
+        """
+        keys = [_request_hash(dataset, request) for dataset, request in api_requests]
+        cached = self._lookup(keys) if self.use_cache else {}
+
+        # files removed from the cache directory have to be downloaded again
+        missing = [key for key, files in cached.items() if not all(os.path.exists(f) for f in files)]
+        if missing:
+            self._forget(missing)
+            for key in missing:
+                del cached[key]
+
+        jobs = []
+        filepaths = []
+        queued = set()
+        for key, (dataset, request) in zip(keys, api_requests):
+            filepath = os.path.join(self.path, f'era5_{dataset.replace("reanalysis-era5-", "")}_{key}.nc')
+
+            # the recorded files can be the netCDF file, a converted Zarr store or the files of each variable
+            if key in cached:
+                print('omittted download for ', filepath)
+                files = cached[key]
+                filepaths.append(files[0] if len(files) == 1 else filepath)
+                continue
+
+            # the same request is not sent twice
+            if key not in queued:
+                queued.add(key)
+                jobs.append((dataset, request, filepath))
+            filepaths.append(filepath)
+
+        return jobs, filepaths
+
+
+    def _create_manifest(self):
+        """Creates the manifest of the cache directory, a SQLite database with one row for each downloaded API request, if it does not exist."""
+        with closing(self._connect()) as db, db:
+            db.execute('CREATE TABLE IF NOT EXISTS downloads (hash TEXT PRIMARY KEY, dataset TEXT, product TEXT, variables TEXT, area TEXT, sortkey TEXT, request TEXT, files TEXT, mtime REAL)')
+            db.execute('CREATE INDEX IF NOT EXISTS downloads_product ON downloads (product, variables, area)')
+
+
+    def _connect(self):
+        """Opens the manifest of the cache directory.
+
+        Returns:
+        --------
+
+        db: sqlite3 connection, which has to be closed by the caller
+        """
+        return sqlite3.connect(self.path / 'manifest.sqlite', timeout = 30)
+
+
+    def _record(self, dataset, request, filepaths, sortkey = None):
+        """Adds downloaded files to the manifest of the cache directory. Completed downloads are recorded immediately, so that they are kept after a later failure.
+
+        Parameter:
+        ----------
+
+        dataset(str): name of the ERA5 data product on the Copernicus server
+        request(dict): API request
+        filepaths(list): paths of downloaded files
+
+        optional:
+
+        sortkey(str): first timestep of the files, if None: first timestep of the request
+        """
+        if sortkey is None:
+            sortkey = _sort_key(request)
+
+        row = (_request_hash(dataset, request), dataset, self.product, json.dumps(self.variables), json.dumps(self.area), sortkey, json.dumps(request), json.dumps(filepaths), time.time())
+        with closing(self._connect()) as db, db:
+            db.execute('INSERT OR REPLACE INTO downloads VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', row)
+
+
+    def _lookup(self, keys):
+        """Returns the paths of the files, which were downloaded for API requests in the manifest.
+
+        Parameter:
+        ----------
+
+        keys(list): hashes of the API requests
+
+        Returns:
+        --------
+
+        cached(dict): paths of files for each hash, which is in the manifest
+        """
+        cached = {}
+        with closing(self._connect()) as db:
+            # SQLite limits the number of parameters of a query
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                rows = db.execute('SELECT hash, files FROM downloads WHERE hash IN (' + ','.join('?' * len(batch)) + ')', batch).fetchall()
+                cached.update((key, json.loads(files)) for key, files in rows)
+        return cached
+
+
+    def _forget(self, keys):
+        """Removes API requests, whose files were deleted, from the manifest.
+
+        Parameter:
+        ----------
+
+        keys(list): hashes of the API requests
+        """
+        with closing(self._connect()) as db, db:
+            db.executemany('DELETE FROM downloads WHERE hash = ?', [(key,) for key in keys])
+
+
+    def _request(self, **kwargs):
+        """Returns an API request for the variables and the domain of the data product.
+
+        Parameter:
+        ----------
+
+        kwargs: further request keywords, e.g. product_type, year, month, day, time
+
+        Returns:
+        --------
+
+        request(dict): API request for the Copernicus server
+        """
+        request = {"format": self.download_format}
+        request.update(self._base_request)
+        request.update(kwargs)
+
+        return request
+
+
+    @classmethod
+    def _get_client(cls):
+        """Returns the cdsapi client of the current thread, which is opened once and then reused for all requests of this thread. The client does not wait for requests to be completed, so that the state of a request can be polled. Its HTTP session keeps a pool of connections to the server."""
+        client = getattr(cls._local, 'client', None)
+        if client is None:
+            # each client needs its own session, since cdsapi uses the same default session for all clients
+            session = requests.Session()
+
+            # keep HTTPS connections open, so that polling and downloading do not repeat the TLS handshake for each call.
+            # Dropped connections are retried with exponential backoff. Rate limits (429) and server errors are left to cdsapi, which retries them much longer.
+            retry = Retry(total = 5, backoff_factor = 2, respect_retry_after_header = False, raise_on_status = False)
+            adapter = HTTPAdapter(pool_connections = 8, pool_maxsize = 8, max_retries = retry)
+            session.mount('https://', adapter)
+
+            client = cdsapi.Client(wait_until_complete = False, session = session)
+            cls._local.client = client
+        return client
+
+
+    def _submit(self, dataset, request):
+        """Sends a single API request to the Copernicus server without waiting for the data. Failed requests are repeated with exponential backoff.
+
+        Parameter:
+        ----------
+
+        dataset(str): name of the ERA5 data product on the Copernicus server
+        request(dict): API request with product type, variables, area and timesteps
+
+        Returns:
+        --------
+
+        result(cdsapi.api.Result): handle to poll the state of the request and to download the data
+        """
+        c = self._get_client()
+
+        for attempt in range(self.retries):
+            try:
+                return c.retrieve(dataset, request)
+            except Exception:
+                if attempt == self.retries - 1:
+                    raise
+                # wait 1s, 2s, 4s, ... before sending the request again
+                time.sleep(2 ** attempt)
+
+
+    def _download(self, result, filepath):
+        """Downloads the data of a completed API request. The data is written to a temporary file (filepath + '.part'), which is renamed when the download is complete, so that interrupted downloads are never mistaken for cached files. Interrupted transfers are resumed from the last received byte.
+
+        Parameter:
+        ----------
+
+        result(cdsapi.api.Result or ecmwf.datastores.Remote): handle of completed request
+        filepath(str): path of output file
+
+        Returns:
+        --------
+
+        filepath(str): path of downloaded file
+        """
+        part = filepath + '.part'
+
+        # the current Copernicus server (ecmwf.datastores) returns results without streaming attributes, their client resumes and checks the transfer itself
+        if not hasattr(result, 'location'):
+            result.download(part)
+            os.replace(part, filepath)
+            print('file downloaded and saved as ', filepath)
+            return filepath
+
+        size = 0
+
+        for attempt in range(self.retries):
+            # request only the missing bytes, if the transfer has been interrupted before
+            headers = {'Range': f'bytes={size}-'} if size > 0 else None
+
+            # stream the data in large chunks to keep the number of write calls low
+            response = result.robust(result.session.get)(result.location, stream = True, headers = headers, verify = result.verify, timeout = result.timeout)
+            try:
+                response.raise_for_status()
+
+                # start from the beginning, if the server does not support partial downloads
+                if response.status_code != 206:
+                    size = 0
+
+                with open(part, 'ab' if size > 0 else 'wb', buffering = self.chunk_size) as f:
+                    for chunk in response.iter_content(chunk_size = self.chunk_size):
+                        f.write(chunk)
+                        size += len(chunk)
+
+            except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+                print('download of ', filepath, ' interrupted: ', e)
+            finally:
+                response.close()
+
+            if size >= result.content_length:
+                break
+            # no need to wait after the last attempt
+            if attempt < self.retries - 1:
+                time.sleep(2 ** attempt)
+
+        if size != result.content_length:
+            raise RuntimeError('download of ' + filepath + ' incomplete: ' + str(size) + ' of ' + str(result.content_length) + ' bytes')
+
+        # rename is atomic, so the file only exists once it is complete
+        os.replace(part, filepath)
+
+        print('file downloaded and saved as ', filepath)
+        return filepath
+
+
+    def _grib_to_netcdf(self, gribpath, filepath):
+        """Converts a downloaded GRIB file to netCDF, with the same coordinate names as netCDF files from the Copernicus server. The netCDF file is written to a temporary file first and renamed when it is complete.
+
+        Parameter:
+        ----------
+
+        gribpath(str): path of GRIB file
+        filepath(str): path of netCDF file
+
+        Returns:
+        --------
+
+        filepath(str): path of netCDF file
+        """
+        part = filepath + '.part'
+
+        # no index file is written next to the GRIB file
+        with xarray.open_dataset(gribpath, engine = 'cfgrib', backend_kwargs = {'indexpath': ''}) as ds:
+            if 'isobaricInhPa' in ds.dims:
+                ds = ds.rename({'isobaricInhPa': 'level'})
+            ds.to_netcdf(part)
+
+        os.replace(part, filepath)
+        if not self.keep_grib:
+            os.remove(gribpath)
+
+        print('file converted and saved as ', filepath)
+        return filepath
+
+
+    def _netcdf_to_zarr(self, filepath):
+        """Converts a downloaded netCDF file to a Zarr store with one chunk per timestep. The store is written to a temporary directory first and renamed when it is complete.
+
+        Parameter:
+        ----------
+
+        filepath(str): path of netCDF file
+
+        Returns:
+        --------
+
+        zarrpath(str): path of Zarr store
+        """
+        zarrpath = os.path.splitext(filepath)[0] + '.zarr'
+        part = zarrpath + '.part'
 
+        with xarray.open_dataset(filepath) as ds:
+            ds.chunk({'time': 1, 'latitude': 180, 'longitude': 360}).to_zarr(part, mode = 'w')
+
+        # an outdated store is replaced
+        if os.path.isdir(zarrpath):
+            shutil.rmtree(zarrpath)
+        os.replace(part, zarrpath)
+        os.remove(filepath)
+
+        print('file converted and saved as ', zarrpath)
+        return zarrpath
+
+
+    def _split_variables(self, filepath):
+        """Splits a downloaded netCDF file into one file for each variable and removes the original file. Files with a single variable are not split.
+
+        Parameter:
+        ----------
+
+        filepath(str): path of netCDF file
+
+        Returns:
+        --------
+
+        filepaths(list): paths of netCDF files for each variable
+        """
+        filepaths = []
+        with xarray.open_dataset(filepath) as ds:
+            if len(ds.data_vars) < 2:
+                return [filepath]
+
+            for v in ds.data_vars:
+                varpath = os.path.splitext(filepath)[0] + '_' + str(v) + '.nc'
+                ds[[v]].to_netcdf(varpath + '.part')
+                os.replace(varpath + '.part', varpath)
+                filepaths.append(varpath)
+
+        os.remove(filepath)
+        print('file split into ', filepaths)
+        return filepaths
+
+
+    def _retrieve(self, dataset, request, filepath):
+        """Sends a single API request, polls its state until the Copernicus server has processed it and downloads the data.
+
+        Parameter:
+        ----------
+
+        dataset(str): name of the ERA5 data product on the Copernicus server
+        request(dict): API request with product type, variables, area and timesteps
+        filepath(str): path of output file
+
+        Returns:
+        --------
+
+        filepaths(list): paths of downloaded files (one file, or one file for each variable if split_variables is True)
+        """
+        result = self._submit(dataset, request)
+
+        while True:
+            result.update()
+            state = result.reply['state']
+
+            if state == 'completed':
+                if self.download_format == 'grib':
+                    gribpath = os.path.splitext(filepath)[0] + '.grib'
+                    filepath = self._grib_to_netcdf(self._download(result, gribpath), filepath)
                 else:
-                        # API request for specific year and month 
-                        c.retrieve('reanalysis-era5-'+ self.product , {
-                            "product_type":   "reanalysis",
-                            "format":         "netcdf",
-                            "area":           '/'.join(self.domain),
-                            "variable":       self.variables,
-                            "year":           [year],
-                            "month":          [month],
-                            "day" :           [day],
-                            "time":           [hour],
-                        }, filepath)
+                    filepath = self._download(result, filepath)
+
+                filepaths = [filepath]
+                if self.split_variables:
+                    filepaths = self._split_variables(filepath)
+                if self.convert_to_zarr:
+                    filepaths = [self._netcdf_to_zarr(f) for f in filepaths]
+                return filepaths
+            elif state == 'failed':
+                error = result.reply.get('error', {}).get('message', '')
+                raise RuntimeError('API request for ' + filepath + ' failed: ' + error)
+
+            time.sleep(self.poll_interval)
 
-                        print('file downloaded and saved as', filepath)
-                        self.files.append(filepath)
+
+    def _submit_all(self, jobs):
+        """Downloads the data for several API requests. The requests are processed by a bounded pool of threads, so that at most max_workers requests are queued on the Copernicus server at the same time and their waiting times overlap. Each thread submits, polls and downloads one request at a time.
+
+        Parameter:
+        ----------
+
+        jobs(list): list with tuples (dataset, request, filepath) for each file to download
+
+        Returns:
+        --------
+
+        results(list): paths of the downloaded files of each request, in the order of jobs. These can differ from the filepath of the job, e.g. for converted Zarr stores.
+        """
+        if len(jobs) == 0:
+            return []
+
+        futures = {}
+        recorded = set()
+        try:
+            with ThreadPoolExecutor(max_workers = self.max_workers) as ex:
+                futures = {ex.submit(self._retrieve, dataset, request, filepath): (dataset, request) for dataset, request, filepath in jobs}
+
+                # downloads are recorded in the order in which they are completed
+                try:
+                    for future in as_completed(futures):
+                        dataset, request = futures[future]
+                        self._record(dataset, request, future.result())
+                        recorded.add(future)
+                except Exception:
+                    # requests which have not been started yet are not sent after a failure
+                    for future in futures:
+                        future.cancel()
+                    raise
+        except Exception:
+            # requests which were running at the failure are completed when the pool is shut down. The files of all successful requests are kept in the cache and added in the order of the requests.
+            for future, (dataset, request) in futures.items():
+                if future.cancelled() or future.exception() is not None:
+                    continue
+                if future not in recorded:
+                    self._record(dataset, request, future.result())
+                self.files.extend(future.result())
+            raise
+
+        # files are added in the order of the requests
+        results = [future.result() for future in futures]
+        for filepaths in results:
+            self.files.extend(filepaths)
+        return results
+
+
+    async def _submit_all_async(self, jobs, max_in_flight):
+        """Downloads the data for several API requests as asyncio tasks. At most max_in_flight requests are processed at the same time, the blocking cdsapi calls run in worker threads.
+
+        Parameter:
+        ----------
+
+        jobs(list): list with tuples (dataset, request, filepath) for each file to download
+        max_in_flight(int): maximum number of requests processed at the same time
+        """
+        if len(jobs) == 0:
+            return
+
+        semaphore = asyncio.Semaphore(max_in_flight)
+        errors = []
+
+        async def retrieve(dataset, request, filepath):
+            async with semaphore:
+                # requests which have not been started yet are not sent after a failure
+                if errors:
+                    return []
+                try:
+                    filepaths = await asyncio.to_thread(self._retrieve, dataset, request, filepath)
+                except Exception as e:
+                    errors.append(e)
+                    raise
+            self._record(dataset, request, filepaths)
+            return filepaths
+
+        # running requests are completed after a failure, so that their files are kept in the cache
+        results = await asyncio.gather(*[retrieve(dataset, request, filepath) for dataset, request, filepath in jobs], return_exceptions = True)
+
+        # files are added in the order of the requests
+        for filepaths in results:
+            if isinstance(filepaths, list):
+                self.files.extend(filepaths)
+        if errors:
+            raise errors[0]
 
 
 
     def get_files(self):
-        import glob
-        if len(self.variables) > 1:
-            vars = self.variables[0]  + self.variables[-1]
-        else:
-            vars = self.variables[0]
+        """Returns the cached files of the data product, which contain the same variables and domain, sorted by their first timestep.
 
-        self.files = glob.glob('cache/*'+ self.product  +'*' +  vars +'*'+ ','.join(self.domain) + '.nc')
+        Returns:
+        --------
+
+        files(list): paths of cached files
+        """
+        with closing(self._connect()) as db:
+            rows = db.execute('SELECT hash, files FROM downloads WHERE product = ? AND variables = ? AND area = ? ORDER BY sortkey, dataset', (self.product, json.dumps(self.variables), json.dumps(self.area))).fetchall()
+
+        self.files = []
+        missing = []
+        for key, files in rows:
+            files = json.loads(files)
+            if all(pathlib.Path(f).exists() for f in files):
+                self.files.extend(files)
+            else:
+                missing.append(key)
+
+        # requests of removed files are downloaded again
+        if missing:
+            self._forget(missing)
         return self.files
 
 
@@ -344,6 +885,7 @@ class Surface():
     Attributes:
     -------------
     obj: is the data object of xarray Dataset with all its attributes. Data can be accessed the same way as for xarray Dataset objects via this attribute.
+    lons, lats: arrays with longitudes and latitudes of the dataset
 
 
     Examples to access xarray attributes:
@@ -352,10 +894,61 @@ class Surface():
     self.obj.dims: dimensions of dataset 
     self.obj.latitude.values : numpy array with latitude values
 
+
+    Example to close the file after plotting:
+    ----------
+
+    with Surface.open(path) as s:
+        s.create_map('t2m')
+
     """
     def __init__(self,  xr_obj):
         self.obj = xr_obj
 
+    @classmethod
+    def open(cls, path, chunks = None):
+        """Opens a netCDF file or Zarr store of ERA5 lazily, so that the plot functions only read the timestep which is displayed.
+
+        Parameter:
+        ----------
+
+        path(str): path of netCDF file or Zarr store (.zarr)
+
+        optional:
+
+        chunks(dict): dask chunks for each dimension, the default is one chunk per timestep
+
+        Returns:
+        --------
+
+        Surface object
+        """
+        if chunks is None:
+            chunks = {'time': 1}
+        if str(path).endswith('.zarr'):
+            return cls(xarray.open_zarr(path, chunks = chunks))
+        return cls(xarray.open_dataset(path, chunks = chunks))
+
+    def close(self):
+        """Closes the files of the dataset."""
+        self.obj.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @functools.cached_property
+    def lons(self):
+        """array with longitudes, read once from the dataset"""
+        return self.obj.longitude.values
+
+    @functools.cached_property
+    def lats(self):
+        """array with latitudes, read once from the dataset"""
+        return self.obj.latitude.values
+
     def get_coords(self):
         """
         Returns:
@@ -364,22 +957,25 @@ class Surface():
         lats(float32): array with latitudes 
 
         """
-        lons = self.obj.longitude.values
-        lats = self.obj.latitude.values
-        return lons, lats 
+        return self.lons, self.lats 
 
-    def create_wind_plot(self,  out = None ):
+    def create_wind_plot(self,  out = None, show = False):
         """
         This function creates a map with surface wind vectors and wind speeds from u and v wind components of surface data. 
+
+        optional:
+
+        out (str): name of output file
+        show (boolean): if True, the figure is displayed after saving it
         """
-        u = self.obj.u100.values[0,::]
-        v= self.obj.v100.values[0,::]
-        lons = self.obj.longitude.values
-        lats = self.obj.latitude.values
-        plotting.plot_surface_wind(lons, lats, u, v, out = out)
+        u = self.obj.u100.isel(time = 0).values
+        v= self.obj.v100.isel(time = 0).values
+        lons = self.lons
+        lats = self.lats
+        plotting.plot_surface_wind(lons, lats, u, v, out = out, show = show)
 
 
-    def create_map(self, variable, out = None):
+    def create_map(self, variable, out = None, show = False):
         """
         This function creates a map of a any chosen climate variable from surface/ single-level data. 
 
@@ -388,20 +984,24 @@ class Surface():
 
         var(str): short name of variable to plot 
 
+        optional:
+
+        out (str): name of output file
+        show (boolean): if True, the figure is displayed after saving it
         """
-        lons = self.obj.longitude.values
-        lats = self.obj.latitude.values
+        lons = self.lons
+        lats = self.lats
 
-        var = self.obj[variable].values[0]
+        var = self.obj[variable].isel(time = 0).values
         unit= str(self.obj[variable].units)
         varname = str(self.obj[variable].long_name)
 
 
-        plotting.plot_map(lons, lats, var,varname, unit, out = out )
+        plotting.plot_map(lons, lats, var,varname, unit, out = out, show = show)
 
 
 
-    def create_contour_map(self, variable, out = None, filled= None, levels = None):
+    def create_contour_map(self, variable, out = None, filled= None, levels = None, show = False):
         """
         This function creates a map of a any chosen climate variable from surface/ single-level data. 
 
@@ -414,15 +1014,16 @@ class Surface():
 
         filled (boolean): if True, contours with filled regions will be created. The default creates contour lines.
         levels : array containing the variable values for which contours are drawn
+        show (boolean): if True, the figure is displayed after saving it
 
         """
-        lons = self.obj.longitude.values
-        lats = self.obj.latitude.values
+        lons = self.lons
+        lats = self.lats
 
-        var = self.obj[variable].values[0]
+        var = self.obj[variable].isel(time = 0).values
         unit= str(self.obj[variable].units)
         varname = str(self.obj[variable].long_name) 
-        plotting.plot_contours(lons, lats, var, varname, out = out , filled = filled, levels = levels)
+        plotting.plot_contours(lons, lats, var, varname, out = out , filled = filled, levels = levels, show = show)
 
 
 
@@ -439,6 +1040,7 @@ class Pressure():
     Attributes:
     -------------
     obj: is the data object of xarray Dataset with all its attributes. Data can be accessed the same way as for xarray Dataset objects via this attribute.
+    lons, lats: arrays with longitudes and latitudes of the dataset
 
 
     Examples to access xarray attributes:
@@ -448,10 +1050,68 @@ class Pressure():
     self.obj.latitude.values : numpy array with latitude values
 
 
+    Example to close the file after plotting:
+    ----------
+
+    with Pressure.open(path) as p:
+        p.create_map('t', 500)
+
+
     """
     def __init__(self,  xr_obj):
         self.obj = xr_obj
 
+        # first timestep, selected lazily so that only this slab is read from disk when the data is accessed
+        self._ds = xr_obj.isel(time = 0)
+
+        # index of each pressure level
+        self._level_idx = {int(l): i for i, l in enumerate(xr_obj.level.values)}
+
+
+    @classmethod
+    def open(cls, path, chunks = None):
+        """Opens a netCDF file or Zarr store of ERA5 lazily, so that the plot functions only read the timestep which is displayed.
+
+        Parameter:
+        ----------
+
+        path(str): path of netCDF file or Zarr store (.zarr)
+
+        optional:
+
+        chunks(dict): dask chunks for each dimension, the default is one chunk per timestep with all pressure levels
+
+        Returns:
+        --------
+
+        Pressure object
+        """
+        if chunks is None:
+            chunks = {'time': 1, 'level': -1}
+        if str(path).endswith('.zarr'):
+            return cls(xarray.open_zarr(path, chunks = chunks))
+        return cls(xarray.open_dataset(path, chunks = chunks))
+
+
+    def close(self):
+        """Closes the files of the dataset."""
+        self.obj.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @functools.cached_property
+    def lons(self):
+        """array with longitudes, read once from the dataset"""
+        return self.obj.longitude.values
+
+    @functools.cached_property
+    def lats(self):
+        """array with latitudes, read once from the dataset"""
+        return self.obj.latitude.values
 
     def get_coords(self):
         """
@@ -462,25 +1122,35 @@ class Pressure():
 
         """
 
-        lons = self.obj.longitude.values
-        lats = self.obj.latitude.values
-        return lons, lats
+        return self.lons, self.lats
+
+
+    def _level_values(self, variable, level):
+        """Returns the values of a variable at one pressure level of the first timestep. Only the plane of this level is read from disk."""
+        if int(level) not in self._level_idx:
+            raise ValueError('pressure level ' + str(level) + ' not in dataset')
+        return self._ds[variable].isel(level = self._level_idx[int(level)]).values.astype(np.float32, copy = False)
 
 
-    def create_synoptic_plot(self,  pl, out = None ):
+    def create_synoptic_plot(self,  pl, out = None, show = False):
         """ This function creates a synoptic map at a chosen pressure level to display upper-level wind circulation and geopotential height. 
+
+        optional:
+
+        out (str): name of output file
+        show (boolean): if True, the figure is displayed after saving it
         """
-        u = self.obj.u.values[0,::]
-        v= self.obj.v.values[0,::]
-        geopotential= self.obj.z.values[0,::]
-        lons = self.obj.longitude.values
-        lats = self.obj.latitude.values
-        plotting.plot_synoptic(lons, lats, u, v, geopotential, pl, out = out)
+        u = self._ds.u.values
+        v= self._ds.v.values
+        geopotential= self._ds.z.values
+        lons = self.lons
+        lats = self.lats
+        plotting.plot_synoptic(lons, lats, u, v, geopotential, pl, out = out, show = show)
 
 
 
 
-    def create_map(self, variable, level, out = None):
+    def create_map(self, variable, level, out = None, show = False):
         """
         This function creates a map of a any chosen climate variable from surface/ single-level data. 
 
@@ -490,24 +1160,26 @@ class Pressure():
         var(str): short name of variable to plot 
         level(str): pressure level or 'column-integrated' to calculated the mean value through the atmospheric column 
 
+        optional:
 
+        out (str): name of output file
+        show (boolean): if True, the figure is displayed after saving it
         """
-        lons = self.obj.longitude.values
-        lats = self.obj.latitude.values
+        lons = self.lons
+        lats = self.lats
 
         if level == 'column-integrated':
-            var = utils.column_integration(self.obj[variable].values[0],  self.obj.z.values[0])
+            var = utils.column_integration(self._ds[variable].values,  self._ds.z.values)
         else:
-            level_idx = np.where(self.obj.level.values== level)[0]
-            var = self.obj[variable].values[0, level_idx , :, :][0]
+            var = self._level_values(variable, level)
 
         unit= str(self.obj[variable].units)
         varname = str(self.obj[variable].long_name)
-        plotting.plot_map(lons, lats, var,varname, unit, out = out )
+        plotting.plot_map(lons, lats, var,varname, unit, out = out, show = show)
 
 
 
-    def create_contour_map(self, variable, level,  out = None, filled= None, levels = None):
+    def create_contour_map(self, variable, level,  out = None, filled= None, levels = None, show = False):
         """
         This function creates a map of a any chosen climate variable from surface/ single-level data. 
 
@@ -521,55 +1193,56 @@ class Pressure():
 
         filled (boolean): if True, contours with filled regions will be created. The default creates contour lines.
         levels : array containing the variable values for which contours are drawn
+        show (boolean): if True, the figure is displayed after saving it
 
         """
-        lons = self.obj.longitude.values
-        lats = self.obj.latitude.values
+        lons = self.lons
+        lats = self.lats
 
 
         if level == 'column-integrated':
-            var = utils.column_integration(self.obj[variable].values[0],  self.obj.z.values[0])
+            var = utils.column_integration(self._ds[variable].values,  self._ds.z.values)
         else:
-            level_idx = np.where(self.obj.level.values== level)[0]
-            var = self.obj[variable].values[0, level_idx , :, :][0]
+            var = self._level_values(variable, level)
 
-        var = self.obj[variable].values[0]
         unit= str(self.obj[variable].units)
         varname = str(self.obj[variable].long_name) 
-        plotting.plot_contours(lons, lats, var, varname, unit= unit, out = out , filled = filled, levels = levels)
+        plotting.plot_contours(lons, lats, var, varname, unit= unit, out = out , filled = filled, levels = levels, show = show)
 
 
 
 
-    def create_vertical_plot(self, variable, dim, unit = None, out = None):
+    def create_vertical_plot(self, variable, dim, unit = None, out = None, show = False):
         """This function creates a 2D map for any chosen climate variable.
 
         Parameter:
         ------------
 
         var (numpy.array) : any climate variable for one timestep (2-dimensionsal)
-        dim (str): 'longitude' or 'latitude' for latitudinal or longitudinal cross section 
+        dim (str): dimension which is averaged, 'latitude' for a longitudinal or 'longitude' for a latitudinal cross section
 
 
         optional:
 
         unit(str) : unit of climate variable 
-        out (str): name of output file"""
+        out (str): name of output file
+        show (boolean): if True, the figure is displayed after saving it"""
 
 
+        if dim not in ('latitude', 'longitude'):
+            raise ValueError('invalid dim ' + str(dim) + ': choose latitude or longitude')
+
         p_levels = self.obj.level.values
 
-        if dim== 'latitude':
-            coords = self.obj.latitude.values
-        if dim == 'longitude':
-            coords = self.obj.latitude.values
+        # the cross section is along the dimension which is not averaged
+        coords = self.lons if dim == 'latitude' else self.lats
 
-        var = utils.dim_average(self.obj, variable, dim)
-        var = var[0]
+        var = utils.dim_average(self._ds, variable, dim).values
 
-        unit= str(self.obj[variable].units)
+        if unit is None:
+            unit= str(self.obj[variable].units)
         varname = str(self.obj[variable].long_name)
-        plotting.plot_vertical(coords, p_levels, var, varname, dim, unit = None, out = None)
+        plotting.plot_vertical(coords, p_levels, var, varname, dim, unit = unit, out = out, show = show)
 
 
 
@@ -4,14 +4,240 @@
 
 import os 
 import cartopy
-import quiver
 import cartopy.feature as cfeat
 import cartopy.crs as ccrs
 import matplotlib.pyplot as plt
+import matplotlib.colors as mcolors
+import matplotlib.ticker as mticker
 import numpy as np
 
+# the map projection of all plots, which is also the coordinate system of the data
+_PLATECARREE = ccrs.PlateCarree()
 
-def plot_surface_wind(lons, lats, u, v, out = None):
+# Natural Earth coastlines, with a resolution which is adapted to the map extent.
+# cartopy caches the geometries and their projected paths, which are reused as long as the same feature and projection objects are used.
+_COASTLINE = cfeat.COASTLINE
+
+# index of the pressure levels (hPa), which can be shown in synoptic plots
+_SYNOPTIC_LEVELS = {850: 1, 500: 3, 300: 5}
+
+# colormaps
+_CMAP_DEFAULT = plt.cm.viridis_r
+_CMAP_TEMP = plt.cm.coolwarm
+_CMAP_WIND = plt.cm.magma_r
+_CMAP_GEOPOTENTIAL = plt.cm.viridis
+
+
+def _map_axes():
+    """This function creates a new figure with map axes and coastlines. All maps share the same projection and coastline objects, which are only created once.
+
+    Returns:
+    ------------
+
+    fig (matplotlib.figure.Figure): new figure
+    ax (cartopy.mpl.geoaxes.GeoAxes): map axes with PlateCarree projection
+    """
+    fig = plt.figure(figsize= (18,9))
+    ax = plt.axes(projection=_PLATECARREE)
+
+    # add coastlines (the drawing order is given by the zorder of the feature, so they can be added before the data)
+    ax.add_feature(_COASTLINE, edgecolor = 'black', facecolor = 'none')
+
+    return fig, ax
+
+
+def _as_float32(*arrays):
+    """Returns the arrays in single precision, which is sufficient for plotting and halves the memory of the plotted arrays. Arrays which are already in single precision are not copied."""
+    arrays = tuple(np.asarray(a, dtype = np.float32) for a in arrays)
+    return arrays[0] if len(arrays) == 1 else arrays
+
+
+def _normalize_wind(u, v):
+    """This function normalizes wind vectors to unit length, which gives a uniform arrow size in wind plots. The wind speed is computed in a single pass with np.hypot and inverted in place, so that both components only need a multiplication and no temporary arrays are created. Calm grid points (no wind) are set to zero.
+
+    Parameter:
+    ------------
+
+    u (numpy.array) : u wind component
+    v (numpy.array) : v wind component
+
+    Returns:
+    ------------
+
+    u_norm, v_norm (numpy.array) : normalized wind components
+    """
+    # wind speed and its reciprocal share one buffer, calm grid points stay zero
+    inv = np.hypot(u, v)
+    np.reciprocal(inv, out = inv, where = inv > 0)
+
+    u_norm = np.multiply(u, inv)
+    v_norm = np.multiply(v, inv, out = inv)
+
+    return u_norm, v_norm
+
+
+def _imshow(ax, lons, lats, var, **kwargs):
+    """This function draws a field on a regular longitude-latitude grid as a single image. This is much faster to render than pcolormesh, which creates one polygon for each grid cell.
+
+    Parameter:
+    ------------
+
+    ax (cartopy.mpl.geoaxes.GeoAxes): axes to draw on
+    lons (numpy.array) : regularly spaced longitudes of data object
+    lats (numpy.array) : regularly spaced latitudes of data object (ascending or descending)
+    var (numpy.array) : any climate variable for one timestep (2-dimensionsal)
+    kwargs: further arguments for imshow, e.g. cmap, vmin, vmax
+
+    Returns:
+    ------------
+
+    m (matplotlib.image.AxesImage): image, which can be used for the colorbar
+    """
+    # ERA5 latitudes are descending, images are drawn from the lowest latitude
+    if lats[0] > lats[-1]:
+        lats = lats[::-1]
+        var = var[::-1]
+
+    # extent of the image spans the outer edges of the grid cells
+    dlon = (lons[-1] - lons[0]) / (len(lons) - 1) / 2
+    dlat = (lats[-1] - lats[0]) / (len(lats) - 1) / 2
+    extent = [lons[0] - dlon, lons[-1] + dlon, lats[0] - dlat, lats[-1] + dlat]
+
+    return ax.imshow(var, extent = extent, origin = 'lower', interpolation = 'nearest', transform = _PLATECARREE, **kwargs)
+
+
+def _regular(coords):
+    """This function checks whether a 1D coordinate array is evenly spaced.
+
+    Parameter:
+    ------------
+
+    coords (numpy.array) : longitudes or latitudes of data object
+
+    Returns:
+    ------------
+
+    True, if all grid spacings are equal
+    """
+    spacing = np.diff(coords)
+    return np.allclose(spacing, spacing[0])
+
+
+def _edges(coords):
+    """This function converts the centres of grid cells to the edges of the grid cells.
+
+    Parameter:
+    ------------
+
+    coords (numpy.array) : longitudes or latitudes of data object (length N)
+
+    Returns:
+    ------------
+
+    edges (numpy.array) : cell edges (length N + 1)
+    """
+    mid = (coords[1:] + coords[:-1]) / 2
+    return np.concatenate(([2 * coords[0] - mid[0]], mid, [2 * coords[-1] - mid[-1]]))
+
+
+def _pcolor(ax, lons, lats, var, **kwargs):
+    """This function draws a gridded field, as a single image for regular grids (see _imshow) and with pcolorfast for irregular grids. Both are much faster than pcolormesh.
+
+    Parameter:
+    ------------
+
+    ax (cartopy.mpl.geoaxes.GeoAxes): axes to draw on
+    lons (numpy.array) : longitudes of data object
+    lats (numpy.array) : latitudes of data object
+    var (numpy.array) : any climate variable for one timestep (2-dimensionsal)
+    kwargs: further arguments for imshow/pcolorfast, e.g. cmap, vmin, vmax
+
+    Returns:
+    ------------
+
+    m : image, which can be used for the colorbar
+    """
+    if _regular(lons) and _regular(lats):
+        return _imshow(ax, lons, lats, var, **kwargs)
+
+    # pcolorfast expects ascending cell edges
+    if lats[0] > lats[-1]:
+        lats = lats[::-1]
+        var = var[::-1]
+
+    return ax.pcolorfast(_edges(lons), _edges(lats), var, rasterized = True, **kwargs)
+
+
+def _shift_global(lons, *fields):
+    """This function shifts global data from 0 - 360 degrees E to -180 - 180 degrees E, so that the maps are centred around the Greenwich meridian.
+
+    Parameter:
+    ------------
+
+    lons (numpy.array) : longitudes of data object
+    fields (numpy.array) : one or more climate variables, with longitudes as the last dimension
+
+    Returns:
+    ------------
+
+    lons, fields : shifted longitudes, followed by the shifted climate variables
+    """
+    shifted = [np.roll(field, field.shape[-1] // 2, axis = -1) for field in fields]
+    return (lons - 180, *shifted)
+
+
+def _color_limits(var, varname):
+    """This function computes the displayed color range of a climate variable, ignoring NaN values.
+
+    Parameter:
+    ------------
+
+    var (numpy.array) : any climate variable for one timestep
+    varname (str): name of climate variable
+
+    Returns:
+    ------------
+
+    vmin, vmax (float): lower and upper limit of the color range
+    """
+    vmin = np.nanmin(var)
+
+    # change displayed color range for any rain variables (due to right-skewed distribution)
+    if 'rain' in varname:
+        vmax = np.nanmean(var) + np.nanstd(var)
+    else:
+        vmax = np.nanmax(var)
+
+    return vmin, vmax
+
+
+def _coarsen(lons, lats, var, factor):
+    """This function averages a field over blocks of factor x factor grid cells, so that very large fields are drawn at a lower resolution. Grid cells which do not fill a complete block at the end of the domain are dropped.
+
+    Parameter:
+    ------------
+
+    lons (numpy.array) : longitudes of data object
+    lats (numpy.array) : latitudes of data object
+    var (numpy.array) : any climate variable for one timestep (2-dimensionsal)
+    factor (int): number of grid cells per block in each direction
+
+    Returns:
+    ------------
+
+    lons, lats, var (numpy.array): block-averaged coordinates and variable
+    """
+    ny = len(lats) // factor
+    nx = len(lons) // factor
+
+    lons = lons[:nx * factor].reshape(nx, factor).mean(axis = 1)
+    lats = lats[:ny * factor].reshape(ny, factor).mean(axis = 1)
+    var = np.nanmean(var[:ny * factor, :nx * factor].reshape(ny, factor, nx, factor), axis = (1, 3))
+
+    return lons, lats, var
+
+
+def plot_surface_wind(lons, lats, u, v, out = None, show = False):
     """This function creates a surface wind map showing both wind vectors and wind speed.
 
     Parameter:
@@ -21,53 +247,50 @@ def plot_surface_wind(lons, lats, u, v, out = None):
     lats (numpy.array) : latitudes of data object
     u_wind (numpy.array) : u wind component for one timesteps (pressure levels )
     v_wind (numpy.array) :v wind component for one timestep (pressure levels)
+
+    optional:
+    out (str): name of output file
+    show (boolean): if True, the figure is displayed after saving it
     """
 
 
     # create output directory for plots if not existing
     plotdir = 'plots'
-    if os.path.isdir(plotdir) ==  False :
-            os.mkdir(plotdir)
-
-    # convert coords to 2d array
-    x,y = np.meshgrid(lons, lats)
+    os.makedirs(plotdir, exist_ok = True)
 
-    plt.figure(figsize= (18,9))
+    u, v = _as_float32(u, v)
 
-    # create axes
-    ax = plt.axes(projection=ccrs.PlateCarree())
+    # create figure and map axes
+    fig, ax = _map_axes()
 
 
     # adapt coordinates for global data
     if np.shape(lons)[0] == 1440:
-        lons = lons - 180
-        var= np.hstack((var[:,720::], var[:,0:720]))
+        lons, u, v = _shift_global(lons, u, v)
     else:
         # set extent for specific region 
         ax.set_extent([np.min(lons),np.max(lons), np.min(lats), np.max(lats) - 10])
 
 
 
-    cmap = plt.cm.magma_r
+    cmap = _CMAP_WIND
 
     # calculate wind speed from u and v components:
-    windspeed = (u ** 2 + v ** 2) ** 0.5
+    windspeed = np.hypot(u, v)
 
     # Plot geopotential
-    m = plt.pcolormesh(lons,lats, windspeed, cmap = cmap)
+    m = _pcolor(ax, lons, lats, windspeed, cmap = cmap)
 
 
-    # Normalize the data for uniform arrow size
-    u_norm = u/ np.sqrt(u ** 2.0 + v** 2.0)
-    v_norm = v / np.sqrt(u ** 2.0 + v ** 2.0)
+    # Normalize the data for uniform arrow size (only for the arrows which are plotted)
+    skip  =(slice(None,None,10),slice(None,None,10))
+    u_norm, v_norm = _normalize_wind(u[skip], v[skip])
 
 
     # Plot wind vectors
-    skip  =(slice(None,None,10),slice(None,None,10))
-    plt.quiver(x[skip],y[skip],u_norm[skip], v_norm[skip], color ='k', transform= ccrs.PlateCarree())
+    plt.quiver(lons[skip[1]], lats[skip[0]], u_norm, v_norm, color ='k', transform= _PLATECARREE)
 
     # colorbar
-    cmap=plt.cm.viridis
     cbar= plt.colorbar(m, extend = 'both')
     cbar.set_label('wind speed (m$^2$ s$^{-1}$ )', fontsize = 15)
 
@@ -80,19 +303,21 @@ def plot_surface_wind(lons, lats, u, v, out = None):
     plt.xlabel('Lon $^\circ$E',  fontsize=25)
     plt.ylabel('Lat $^\circ$N',  fontsize=25)
 
-    # add extra features 
-    ax.coastlines()
 
     if out == None:
         out ='surface_winds.png'
 
     plt.savefig(os.path.join(plotdir, out))
-    plt.show()
+    if show:
+        plt.show()
 
+    # free the memory of the figure
+    plt.close(fig)
 
 
 
-def plot_synoptic(lons, lats, u, v, geopotential, pl, out = None  ):
+
+def plot_synoptic(lons, lats, u, v, geopotential, pl, out = None, show = False):
     """This function creates a map to display the synoptic environment, which is represented as upper-level wind vectors together with geopotential height.
 
     Parameter:
@@ -107,58 +332,51 @@ def plot_synoptic(lons, lats, u, v, geopotential, pl, out = None  ):
 
     optional:
     pl (int): pressure level (850,500 or 300)
-    out (str): name for output file
+    out (str): name for output file, if None: the figure is saved as synoptic.png
+    show (boolean): if True, the figure is displayed after saving it
 
     """
     # create output directory for plots if not existing
     plotdir = 'plots'
-    if os.path.isdir(plotdir) ==  False :
-            os.mkdir(plotdir)
-
-    # convert coords to 2d array
-    x,y = np.meshgrid(lons, lats)
+    os.makedirs(plotdir, exist_ok = True)
 
     # convert pressure level to index
-    if pl == 850:
-        level= 1
-    if pl == 500:
-        level = 3
-    if pl == 300:
-        level= 5
+    if pl not in _SYNOPTIC_LEVELS:
+        raise ValueError('invalid pressure level ' + str(pl) + ': choose 850, 500 or 300')
+    level = _SYNOPTIC_LEVELS[pl]
 
-    plt.figure(figsize= (18,9))
+    # select data at pressure level once, in single precision (geopotential in km^2 s^-2)
+    uu, vv = _as_float32(u[level], v[level])
+    g_km = np.multiply(geopotential[level], 1e-3, dtype = np.float32)
 
-    # create axes
-    ax = plt.axes(projection=ccrs.PlateCarree())
+    # create figure and map axes
+    fig, ax = _map_axes()
 
     # adapt coordinates for global data
     if np.shape(lons)[0] == 1440:
-        lons = lons - 180
-        var= np.hstack((var[:,720::], var[:,0:720]))
+        lons, uu, vv, g_km = _shift_global(lons, uu, vv, g_km)
     else:
         # set extent for specific region 
         ax.set_extent([np.min(lons),np.max(lons), np.min(lats), np.max(lats) - 10])
 
 
 
-    cmap = plt.cm.viridis
+    cmap = _CMAP_GEOPOTENTIAL
 
 
     # Plot geopotential
-    m = plt.pcolormesh(lons,lats, geopotential[level,:,:]/1000, cmap = cmap)
+    m = _pcolor(ax, lons, lats, g_km, cmap = cmap)
 
 
-    # Normalize the data for uniform arrow size
-    u_norm = u[level, :,:]/ np.sqrt(u[level,:,:] ** 2.0 + v[level,:,:] ** 2.0)
-    v_norm = v[level, :,:] / np.sqrt(u[level, :,:] ** 2.0 + v[level,:,:] ** 2.0)
+    # Normalize the data for uniform arrow size (only for the arrows which are plotted)
+    skip  =(slice(None,None,10),slice(None,None,10))
+    u_norm, v_norm = _normalize_wind(uu[skip], vv[skip])
 
 
     # Plot wind vectors 
-    skip  =(slice(None,None,10),slice(None,None,10))
-    plt.quiver(x[skip],y[skip],u_norm[skip], v_norm[skip], color ='k', transform= ccrs.PlateCarree())
+    plt.quiver(lons[skip[1]], lats[skip[0]], u_norm, v_norm, color ='k', transform= _PLATECARREE)
 
     # colorbar
-    cmap=plt.cm.viridis
     cbar= plt.colorbar(m, extend = 'both')
     cbar.set_label('geopotential (km$^2$ s$^{-2}$ )', fontsize = 15)
 
@@ -173,101 +391,240 @@ def plot_synoptic(lons, lats, u, v, geopotential, pl, out = None  ):
     plt.xlabel('Lon $^\circ$E',  fontsize=25)
     plt.ylabel('Lat $^\circ$N',  fontsize=25)
 
-    # add extra features
-    ax.coastlines()
 
     if out == None:
         out ='synoptic.png'
 
     plt.savefig(os.path.join(plotdir, out))
-    plt.show()
+    if show:
+        plt.show()
 
+    # free the memory of the figure
+    plt.close(fig)
 
-def plot_map(lons, lats, var, varname, unit = None, out = None):
-    """This function creates a 2D map for any chosen climate variable.
 
-    Parameter:
-    ------------
+class MapRenderer():
+    """
+    The MapRenderer class creates a 2D map for any chosen climate variable, which can be reused for further timesteps. Figure, axes, colorbar, labels and coastlines are only created once and for each new timestep only the displayed field is replaced.
+    This is much faster than calling plot_map for each timestep, e.g. to plot time series or to create animations.
 
+    Parameter:
+    ----------
     lons (numpy.array) : longitudes of data object
     lats (numpy.array) : latitudes of data object
-    var (numpy.array) : any climate variable for one timestep (2-dimensionsal)
-    varname (str): name of climate variables 
+    var (numpy.array) : any climate variable for the first timestep (2-dimensionsal)
+    varname (str): name of climate variables
 
     optional:
+    unit(str) : unit of climate variable
+    coarsen (int): if given, the variable is averaged over blocks of coarsen x coarsen grid cells before plotting, which is much faster for very large fields
+
+    Attributes:
+    -----------
+    fig (matplotlib.figure.Figure): figure of the map
+    ax (cartopy.mpl.geoaxes.GeoAxes): map axes
+    mesh: image of the displayed field
+    cbar (matplotlib.colorbar.Colorbar): colorbar of the displayed field
+
+    Example:
+    ----------
+    renderer = MapRenderer(lons, lats, var[0], varname, unit)
+    for t in range(len(var)):
+        renderer.update(var[t], out = 'map_' + str(t) + '.png')
+    renderer.close()
 
-    unit(str) : unit of climate variable 
-    out (str): name of output file
     """
+    def __init__(self, lons, lats, var, varname, unit = None, coarsen = None):
+        self.lons = lons
+        self.lats = lats
+        self.varname = varname
+        self.coarsen = coarsen
 
+        # create figure and map axes
+        self.fig, self.ax = _map_axes()
 
-    # create output directory for plots if not existing
-    plotdir = 'plots'
-    if os.path.isdir(plotdir) ==  False :
-            os.mkdir(plotdir)
+        # set extent for specific region (global data are shifted in _prepare)
+        if np.shape(lons)[0] != 1440:
+            self.ax.set_extent([np.min(lons),np.max(lons), np.min(lats), np.max(lats) - 10])
 
-    plt.figure(figsize= (18,9))
+        lons, lats, var = self._prepare(var)
+        self._regular = _regular(lons) and _regular(lats)
 
-    # create axes
-    ax = plt.axes(projection=ccrs.PlateCarree())
+        # colormap
+        self.cmap = _CMAP_DEFAULT
+        if 'temp' in varname:
+             self.cmap = _CMAP_TEMP
 
-    # adapt coordinates for global data
-    if np.shape(lons)[0] == 1440:
-        lons = lons - 180
-        var= np.hstack((var[:,720::], var[:,0:720]))
-    else:
-        # set extent for specific region 
-        ax.set_extent([np.min(lons),np.max(lons), np.min(lats), np.max(lats) - 10])
+        # displayed color range
+        vmin, vmax = _color_limits(var, varname)
 
+        # Plot climate variable 
+        self.mesh = _pcolor(self.ax, lons, lats, var, cmap = self.cmap, vmin = vmin, vmax = vmax)
 
-    # convert coords from 1d to 2d array
-    x,y = np.meshgrid(lons, lats)
+        # colorbar
+        if unit == None:
+            unit = " "
+        else:
+            unit = ' ('+ unit+ ')'
 
-    # colormap
-    cmap = plt.cm.viridis_r
-    if 'temp' in varname:
-         cmap = plt.cm.coolwarm
+        self.cbar= plt.colorbar(self.mesh, extend = 'both')
+        self.cbar.set_label(varname + unit , fontsize = 15)
 
-    # change displayed color range for any rain variables (due to right-skewed distribution)
-    if 'rain' in varname:
-        vmax = np.nanmean(var) + np.nanstd(var)
 
-    # Plot climate variable 
-    m = plt.pcolormesh(lons,lats, var, cmap = cmap, vmin= np.nanmin(var), vmax = np.nanmax(var))
+        # axis labels
+        xlabels = np.linspace(int(np.nanmin(lons)), int(np.nanmax(lons)), 5)
+        ylabels = np.linspace(int(np.nanmin(lats)), int(np.nanmax(lats)) , 5)
+        plt.xticks(xlabels, xlabels, fontsize=20)
+        plt.yticks(ylabels,ylabels, fontsize=20)
+        plt.xlabel('Lon $^\circ$E',  fontsize=25)
+        plt.ylabel('Lat $^\circ$N',  fontsize=25)
 
-    # colorbar
-    if unit == None:
-        unit = " "
-    else:
-        unit = ' ('+ unit+ ')'
 
-    cmap=plt.cm.viridis
-    cbar= plt.colorbar(m, extend = 'both')
-    cbar.set_label(varname + unit , fontsize = 15)
 
+    def _prepare(self, var):
+        """This function shifts global data and reduces the resolution of the variable, if selected.
 
-    # axis labels
-    xlabels = np.linspace(int(np.nanmin(lons)), int(np.nanmax(lons)), 5)
-    ylabels = np.linspace(int(np.nanmin(lats)), int(np.nanmax(lats)) , 5)
-    plt.xticks(xlabels, xlabels, fontsize=20)
-    plt.yticks(ylabels,ylabels, fontsize=20)
-    plt.xlabel('Lon $^\circ$E',  fontsize=25)
-    plt.ylabel('Lat $^\circ$N',  fontsize=25)
+        Returns:
+        ------------
+
+        lons, lats, var (numpy.array): coordinates and variable as they are displayed
+        """
+        lons, lats = self.lons, self.lats
+
+        var = _as_float32(var)
+
+        # adapt coordinates for global data
+        if np.shape(lons)[0] == 1440:
+            lons, var = _shift_global(lons, var)
+
+        # reduce the resolution of very large fields
+        if self.coarsen is not None:
+            lons, lats, var = _coarsen(lons, lats, var, self.coarsen)
+
+        return lons, lats, var
+
+
+    def update(self, var, out = None):
+        """This function replaces the displayed field with the climate variable of another timestep. The colorbar follows the new color range.
 
-    # add extra features
-    ax.coastlines()
+        Parameter:
+        ------------
+
+        var (numpy.array) : climate variable for one timestep, on the same grid as the first timestep
+
+        optional:
+        out (str): name of output file, if given the map is saved
+        """
+        lons, lats, var = self._prepare(var)
+        vmin, vmax = _color_limits(var, self.varname)
+
+        if self._regular:
+            # only the data of the image are replaced (images are drawn from the lowest latitude, see _imshow)
+            if lats[0] > lats[-1]:
+                var = var[::-1]
+            self.mesh.set_data(var)
+            self.mesh.set_clim(vmin, vmax)
+        else:
+            self.mesh.remove()
+            self.mesh = _pcolor(self.ax, lons, lats, var, cmap = self.cmap, vmin = vmin, vmax = vmax)
+            self.cbar.update_normal(self.mesh)
+
+        if out is not None:
+            self.save(out)
+
+
+    def save(self, out):
+        """This function saves the map in the plots directory.
+
+        Parameter:
+        ------------
+
+        out (str): name of output file
+        """
+        # create output directory for plots if not existing
+        plotdir = 'plots'
+        os.makedirs(plotdir, exist_ok = True)
+
+        self.fig.savefig(os.path.join(plotdir, out))
+
+
+    def close(self):
+        """This function closes the figure and frees its memory."""
+        plt.close(self.fig)
+
+
+
+def plot_map(lons, lats, var, varname, unit = None, out = None, coarsen = None, show = False):
+    """This function creates a 2D map for any chosen climate variable. To plot many timesteps of the same variable, use MapRenderer instead.
+
+    Parameter:
+    ------------
+
+    lons (numpy.array) : longitudes of data object
+    lats (numpy.array) : latitudes of data object
+    var (numpy.array) : any climate variable for one timestep (2-dimensionsal)
+    varname (str): name of climate variables 
+
+    optional:
+
+    unit(str) : unit of climate variable 
+    out (str): name of output file
+    coarsen (int): if given, the variable is averaged over blocks of coarsen x coarsen grid cells before plotting, which is much faster for very large fields
+    show (boolean): if True, the figure is displayed after saving it
+    """
+    renderer = MapRenderer(lons, lats, var, varname, unit = unit, coarsen = coarsen)
 
     if out == None:
         out =''.join(varname) +'_map.png'
 
+    renderer.save(out)
+    if show:
+        plt.show()
 
-    plt.savefig(os.path.join(plotdir, out))
-    plt.show()
+    # free the memory of the figure
+    renderer.close()
+
+
+
+
+def _contour_image(ax, lons, lats, var, levels, cmap, vmin, vmax):
+    """This function draws filled contours of a field on a regular longitude-latitude grid as an image with one discrete color for each contour interval. This gives the same appearance as contourf, but is much faster to draw, because no contour polygons are computed.
+
+    Parameter:
+    ------------
+
+    ax (cartopy.mpl.geoaxes.GeoAxes): axes to draw on
+    lons (numpy.array) : regularly spaced longitudes of data object
+    lats (numpy.array) : regularly spaced latitudes of data object
+    var (numpy.array) : any climate variable for one timestep (2-dimensionsal)
+    levels (int): number of contour intervals or evenly spaced array with contour levels
+    cmap (matplotlib.colors.Colormap): colormap
+    vmin, vmax (float): color range
+
+    Returns:
+    ------------
+
+    m (matplotlib.image.AxesImage): image, which can be used for the colorbar
+    """
+    if np.ndim(levels) == 0:
+        # same choice of levels as contourf: nice numbers which span the data
+        zmin, zmax = np.nanmin(var), np.nanmax(var)
+        levels = mticker.MaxNLocator(levels + 1, min_n_ticks = 1).tick_values(zmin, zmax)
+        under = np.nonzero(levels < zmin)[0]
+        over = np.nonzero(levels > zmax)[0]
+        levels = levels[(under[-1] if len(under) else 0):(over[0] + 1 if len(over) else len(levels))]
+    levels = np.asarray(levels, dtype = float)
+
+    # values outside of the contour levels are not filled, as for contourf
+    var = np.ma.masked_outside(var, levels[0], levels[-1])
 
+    # each interval gets the color of its midpoint, as for contourf
+    colors = cmap(mcolors.Normalize(vmin, vmax)(0.5 * (levels[1:] + levels[:-1])))
 
+    return _imshow(ax, lons, lats, var, cmap = mcolors.ListedColormap(colors), norm = mcolors.BoundaryNorm(levels, len(colors)))
 
 
-def plot_contours(lons, lats, var, varname, unit = None, out = None, filled = False, levels = None):
+def plot_contours(lons, lats, var, varname, unit = None, out = None, filled = False, levels = None, coarsen = None, show = False):
     """This function creates a 2D contour map of any chosen variable 
 
     Parameter:
@@ -283,59 +640,61 @@ def plot_contours(lons, lats, var, varname, unit = None, out = None, filled = Fa
     unit(str) : unit of climate variable 
     out (str): name of output file
     filled (boolean): if True, contours are filled with colours, standard: contours are simple lines
-    levels (int): list or array with numbers and positions of contour lines/regions 
+    levels (int): list or array with numbers and positions of contour lines/regions. Filled contours with a number or evenly spaced levels are drawn as an image with discrete colors (much faster for large fields)
+    coarsen (int): if given, the variable is averaged over blocks of coarsen x coarsen grid cells before plotting, which is much faster for very large fields
+    show (boolean): if True, the figure is displayed after saving it
     """
 
 
     # create output directory for plots if not existing
     plotdir = 'plots'
-    if os.path.isdir(plotdir) ==  False :
-            os.mkdir(plotdir)
+    os.makedirs(plotdir, exist_ok = True)
 
-    plt.figure(figsize= (18,9))
+    var = _as_float32(var)
 
-    # create axes
-    ax = plt.axes(projection=ccrs.PlateCarree())
+    # create figure and map axes
+    fig, ax = _map_axes()
 
     # adapt coordinates for global data
     if np.shape(lons)[0] == 1440:
-        lons = lons - 180
-        var= np.hstack((var[:,720::], var[:,0:720]))
+        lons, var = _shift_global(lons, var)
     else:
         # set extent for specific region 
         ax.set_extent([np.min(lons),np.max(lons), np.min(lats), np.max(lats) - 10])
 
+    # reduce the resolution of very large fields
+    if coarsen is not None:
+        lons, lats, var = _coarsen(lons, lats, var, coarsen)
 
-    # convert coords to 2d array
-    x,y = np.meshgrid(lons, lats)
-
-    # colormap
-    cmap = plt.cm.plasma
 
     # colormap
-    cmap = plt.cm.viridis_r
+    cmap = _CMAP_DEFAULT
     if 'temp' in varname:
-         cmap = plt.cm.coolwarm
+         cmap = _CMAP_TEMP
 
-    # change displayed color range for any rain variables (due to right-skewed distribution)
-    if 'rain' in varname:
-        vmax = np.nanmean(var) + np.nanstd(var)
+    # displayed color range
+    vmin, vmax = _color_limits(var, varname)
 
     if filled == None:
         filled= False
 
 
-    if filled == False:
+    # filled contours with evenly spaced levels on regular grids are drawn as an image with discrete colors
+    if filled and levels is not None and _regular(lons) and _regular(lats) and (np.ndim(levels) == 0 or _regular(levels)):
+        m = _contour_image(ax, lons, lats, var, levels, cmap, vmin, vmax)
+
+    # contours are rasterized, which keeps vector output (pdf, svg) small
+    elif filled == False:
         # Plot climate variable
-        if levels == None:
-            m = plt.contour(x, y,  var, cmap = cmap, vmin= np.nanmin(var), vmax = np.nanmax(var))
+        if levels is None:
+            m = plt.contour(lons, lats,  var, cmap = cmap, vmin = vmin, vmax = vmax, rasterized = True)
         else:
-             m = plt.contour(x, y,  var, levels, cmap = cmap, vmin= np.nanmin(var), vmax = np.nanmax(var))
+             m = plt.contour(lons, lats,  var, levels, cmap = cmap, vmin = vmin, vmax = vmax, rasterized = True)
     else:
-        if levels == None:
-            m = plt.contourf(x,y, var, cmap = cmap, vmin= np.nanmin(var), vmax = np.nanmax(var))
+        if levels is None:
+            m = plt.contourf(lons, lats, var, cmap = cmap, vmin = vmin, vmax = vmax, rasterized = True)
         else:
-            m = plt.contourf(x,y, var, levels, cmap = cmap, vmin= np.nanmin(var), vmax = np.nanmax(var))
+            m = plt.contourf(lons, lats, var, levels, cmap = cmap, vmin = vmin, vmax = vmax, rasterized = True)
 
 
 
@@ -345,7 +704,6 @@ def plot_contours(lons, lats, var, varname, unit = None, out = None, filled = Fa
     else:
         unit = ' ('+ unit+ ')'
 
-    cmap=plt.cm.viridis
     cbar= plt.colorbar(m, extend = 'both')
     cbar.set_label(varname + unit , fontsize = 15)
 
@@ -357,20 +715,22 @@ def plot_contours(lons, lats, var, varname, unit = None, out = None, filled = Fa
     plt.xlabel('Lon $^\circ$E',  fontsize=25)
     plt.ylabel('Lat $^\circ$N',  fontsize=25)
 
-    # add extra features
-    ax.coastlines()
 
     if out == None:
         out = ''.join(varname) +'_contourmap.png'
 
     plt.savefig(os.path.join(plotdir, out))
-    plt.show()
+    if show:
+        plt.show()
+
+    # free the memory of the figure
+    plt.close(fig)
 
 
 
 
 
-def plot_vertical(coords, p_levels, var, varname, xaxis, unit = None, out = None):
+def plot_vertical(coords, p_levels, var, varname, xaxis, unit = None, out = None, show = False):
     """This function creates a 2D map for any chosen climate variable.
 
     Parameter:
@@ -387,28 +747,29 @@ def plot_vertical(coords, p_levels, var, varname, xaxis, unit = None, out = None
 
     unit(str) : unit of climate variable 
     out (str): name of output file
+    show (boolean): if True, the figure is displayed after saving it
     """
 
 
     # create output directory for plots if not existing
     plotdir = 'plots'
-    if os.path.isdir(plotdir) ==  False :
-            os.mkdir(plotdir)
+    os.makedirs(plotdir, exist_ok = True)
 
-    plt.figure(figsize= (18,9))
+    var = _as_float32(var)
+
+    fig = plt.figure(figsize= (18,9))
 
     # colormap
-    cmap = plt.cm.viridis_r
+    cmap = _CMAP_DEFAULT
     if 'temp' in varname:
-         cmap = plt.cm.coolwarm
+         cmap = _CMAP_TEMP
 
-    # change displayed color range for any rain variables (due to right-skewed distribution)
-    if 'rain' in varname:
-        vmax = np.nanmean(var) + np.nanstd(var)
+    # displayed color range
+    vmin, vmax = _color_limits(var, varname)
 
 
-    # Plot climate variable
-    m = plt.pcolormesh(coords, p_levels, var, cmap = cmap, vmin= np.nanmin(var), vmax = np.nanmax(var))
+    # Plot climate variable (rasterized, so that vector output does not contain one polygon per grid cell)
+    m = plt.pcolormesh(coords, p_levels, var, cmap = cmap, vmin = vmin, vmax = vmax, rasterized = True)
 
     # colorbar
     if unit == None:
@@ -416,7 +777,6 @@ def plot_vertical(coords, p_levels, var, varname, xaxis, unit = None, out = None
     else:
         unit = ' ('+ unit+ ')'
 
-    cmap=plt.cm.viridis
     cbar= plt.colorbar(m, extend = 'both')
     cbar.set_label(varname + unit , fontsize = 15)
 
@@ -441,7 +801,11 @@ def plot_vertical(coords, p_levels, var, varname, xaxis, unit = None, out = None
 
 
     plt.savefig(os.path.join(plotdir, out))
-    plt.show()
+    if show:
+        plt.show()
+
+    # free the memory of the figure
+    plt.close(fig)
 
 
 
@@ -3,7 +3,7 @@
 
 import numpy as np
 
-def geopotential_to_height(z):
+def geopotential_to_height(z, out = None):
     """ This function converts geopotential heights to geometric heights. This approximation takes into account the varying gravitational force with heights, but neglects latitudinal vairations.
 
 
@@ -12,6 +12,9 @@ def geopotential_to_height(z):
 
     z(float) : (1D or multi-dimenstional) array with geopotential heights
 
+    optional:
+    out(float): preallocated array of same shape as z, in which the result is stored (must not be z itself)
+
     Returns:
     ----------
 
@@ -20,11 +23,55 @@ def geopotential_to_height(z):
     """
     g = 9.80665 # standard gravity 
     Re = 6.371 * 10**6  # earth radius
-    geometric_heights   = (z*Re / (g * Re - z))
+
+    z = np.asarray(z)
+    if out is None:
+        out = np.empty(z.shape, dtype = np.result_type(z, 1.0))
+
+    # z*Re / (g*Re - z) = z / (g - z/Re), computed in a single output buffer without temporary arrays
+    geometric_heights = np.divide(z, Re, out = out)
+    np.subtract(g, geometric_heights, out = geometric_heights)
+    np.divide(z, geometric_heights, out = geometric_heights)
 
     return geometric_heights 
 
 
+def _trapz(values, x, axis = 0):
+    """This function integrates values with the trapezoidal rule along one axis. The trapezoidal rule is written as a weighted sum of the values, w_k = (x_k+1 - x_k-1) / 2, which is contracted with np.einsum in a single pass without temporary arrays of the size of values.
+
+    Parameters:
+    -----------
+
+    values(float): 1D or multi-dimensional array with values to integrate
+    x(float): array of same shape as values or 1D array with coordinates along axis
+    axis(int): axis along which to integrate
+
+    Returns:
+    --------
+
+    integral(float): array with integrated values (dimension reduced by 1)
+    """
+    # integration axis is moved to the front (views, no copies)
+    values = np.moveaxis(np.asarray(values), axis, 0)
+    x = np.asarray(x)
+    if x.ndim > 1:
+        x = np.moveaxis(x, axis, 0)
+
+    # trapezoidal weights of each coordinate, the outer coordinates only belong to one interval.
+    # A single coordinate does not span an interval, so the integral is zero.
+    weights = np.zeros(x.shape, dtype = np.result_type(x, 1.0))
+    if x.shape[0] > 1:
+        np.subtract(x[2:], x[:-2], out = weights[1:-1])
+        np.subtract(x[1:2], x[:1], out = weights[:1])
+        np.subtract(x[-1:], x[-2:-1], out = weights[-1:])
+        weights *= 0.5
+
+    # weighted sum along the first axis, 1D coordinates are broadcasted
+    if weights.ndim == 1:
+        return np.einsum('i...,i->...', values, weights)
+    return np.einsum('i...,i...->...', values, weights)
+
+
 def column_integration(values, z, ax = None ):
     """This functions calculates the column-integrated value of a given atmospheric variable at different pressure levels
 
@@ -49,7 +96,7 @@ def column_integration(values, z, ax = None ):
         ax = 0
 
     # integration of column values
-    colint = np.trapz(values, geometric_heights, axis =ax )
+    colint = _trapz(values, geometric_heights, axis =ax )
 
     return colint
 
@@ -69,13 +116,12 @@ def dim_average(xr_obj, var, dim):
     Returns:
     --------
 
-    avg: array with reduced dimension, containing the averages along time, latitudes or longitudes 
+    avg: xarray DataArray with reduced dimension, containing the averages along time, latitudes or longitudes (lazy, if xr_obj is chunked)
 
     """
 
-    data = xr_obj[var].values
-    ax = np.where(np.array(xr_obj[var].dims) == dim)[0][0]
-    avg = np.nanmean(data, axis = ax)
+    # xarray reduces along the named dimension, without loading the whole variable into memory first
+    avg = xr_obj[var].mean(dim = dim, skipna = True)
 
     return avg
 
@@ -0,0 +1,158 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+import xarray
+
+from creampy.dataproducts import ERA5, _request_hash, _sort_key
+
+
+@pytest.fixture
+def era5(tmp_path, monkeypatch):
+    # the cache directory is created in the working directory
+    monkeypatch.chdir(tmp_path)
+    return ERA5('single-levels', ['2m_temperature'], 'hourly', domain = ['50', '70', '30', '110'])
+
+
+def test_request_hash_is_independent_of_keyword_order():
+    a = {'year': ['2000'], 'month': ['01'], 'variable': ['2m_temperature']}
+    b = {'variable': ['2m_temperature'], 'month': ['01'], 'year': ['2000']}
+
+    assert _request_hash('reanalysis-era5-single-levels', a) == _request_hash('reanalysis-era5-single-levels', b)
+    assert len(_request_hash('reanalysis-era5-single-levels', a)) == 16
+
+
+def test_request_hash_differs_for_different_requests():
+    request = {'year': ['2000'], 'month': ['01']}
+
+    assert _request_hash('reanalysis-era5-single-levels', request) != _request_hash('reanalysis-era5-single-levels', dict(request, month = ['02']))
+    assert _request_hash('reanalysis-era5-single-levels', request) != _request_hash('reanalysis-era5-pressure-levels', request)
+
+
+def test_sort_key():
+    assert _sort_key({'year': '2001', 'month': ['10', '2'], 'day': ['05'], 'time': ['13:00', '07:00']}) == '2001-02-05 07:00'
+    assert _sort_key({'year': ['1999'], 'month': ['12'], 'time': ['00:00']}) == '1999-12-01 00:00'
+
+
+def test_cached_requests_are_not_planned_again(era5):
+    dataset = 'reanalysis-era5-single-levels'
+    requests = [(dataset, era5._request(year = ['2000'], month = [m])) for m in ('01', '02')]
+
+    jobs, filepaths = era5._plan(requests)
+    assert [job[2] for job in jobs] == filepaths
+
+    # the first request was downloaded
+    open(filepaths[0], 'w').close()
+    era5._record(*requests[0], [filepaths[0]])
+
+    jobs, _ = era5._plan(requests)
+    assert [job[1] for job in jobs] == [requests[1][1]]
+
+    era5.use_cache = False
+    jobs, _ = era5._plan(requests)
+    assert len(jobs) == 2
+
+    # a removed file is downloaded again and dropped from the manifest
+    era5.use_cache = True
+    os.remove(filepaths[0])
+    jobs, _ = era5._plan(requests)
+    assert len(jobs) == 2
+    assert era5._lookup([_request_hash(*requests[0])]) == {}
+
+
+def test_get_files_is_sorted_in_time_and_drops_removed_files(era5):
+    dataset = 'reanalysis-era5-single-levels'
+    paths = {}
+    # recorded in a different order than in time
+    for month in ('03', '01', '02'):
+        request = era5._request(year = ['2000'], month = [month])
+        paths[month] = str(era5.path / ('era5_' + month + '.nc'))
+        open(paths[month], 'w').close()
+        era5._record(dataset, request, [paths[month]])
+
+    assert era5.get_files() == [paths['01'], paths['02'], paths['03']]
+
+    # other variables are not returned
+    other = ERA5('single-levels', ['total_precipitation'], 'hourly', domain = ['50', '70', '30', '110'])
+    assert other.get_files() == []
+
+    # removed files are removed from the manifest and downloaded again
+    (era5.path / 'era5_02.nc').unlink()
+    assert era5.get_files() == [paths['01'], paths['03']]
+    jobs, _ = era5._plan([(dataset, era5._request(year = ['2000'], month = ['02']))])
+    assert len(jobs) == 1
+
+
+def test_merged_composite_replaces_its_files_in_the_manifest(era5):
+    dataset = 'reanalysis-era5-single-levels'
+    requests = []
+    filepaths = []
+    for day in (2, 1):
+        request = era5._request(year = ['2000'], month = ['01'], day = [f'{day:02d}'], time = ['00:00'])
+        ds = xarray.Dataset({'t2m': (('time', 'latitude'), np.full((1, 2), float(day)))},
+                            coords = {'time': [np.datetime64(f'2000-01-{day:02d}')], 'latitude': [30.0, 50.0]})
+        filepath = str(era5.path / f'day{day}.nc')
+        ds.to_netcdf(filepath)
+        era5._record(dataset, request, [filepath])
+        requests.append(request)
+        filepaths.append(filepath)
+
+    era5._merge(dataset, requests, filepaths, 'composite.nc')
+
+    outpath = str(era5.path / 'composite.nc')
+    assert era5.get_files() == [outpath]
+    assert era5._lookup([_request_hash(dataset, request) for request in requests]) == {}
+    with xarray.open_dataset(outpath) as ds:
+        np.testing.assert_array_equal(ds.t2m.values[:, 0], [1.0, 2.0])
+
+
+class _FakeRemote:
+    """Stands in for ecmwf.datastores.Remote, which has no streaming attributes."""
+
+    def download(self, target):
+        with open(target, 'wb') as f:
+            f.write(b'data')
+        return target
+
+
+def test_download_of_datastores_result(era5):
+    filepath = str(era5.path / 'era5.nc')
+    assert era5._download(_FakeRemote(), filepath) == filepath
+    with open(filepath, 'rb') as f:
+        assert f.read() == b'data'
+    assert not (era5.path / 'era5.nc.part').exists()
+
+
+def test_single_variable_finds_files_of_variable_list(era5):
+    dataset = 'reanalysis-era5-single-levels'
+    filepath = era5.path / 'era5.nc'
+    filepath.touch()
+    era5._record(dataset, era5._request(year = ['2000'], month = ['01']), [str(filepath)])
+
+    single = ERA5('single-levels', '2m_temperature', 'hourly', domain = ['50', '70', '30', '110'])
+    assert single.variables == ['2m_temperature']
+    assert single.get_files() == [str(filepath)]
+
+
+def test_successful_downloads_are_kept_after_a_failure(era5, monkeypatch):
+    dataset = 'reanalysis-era5-single-levels'
+    jobs, filepaths = era5._plan([(dataset, era5._request(year = ['2000'], month = [m])) for m in ('01', '02', '03')])
+
+    # all requests are running, when the second one fails
+    barrier = threading.Barrier(len(jobs))
+
+    def retrieve(dataset, request, filepath):
+        barrier.wait()
+        if request['month'] == ['02']:
+            raise RuntimeError('API request for ' + filepath + ' failed')
+        open(filepath, 'w').close()
+        return [filepath]
+
+    monkeypatch.setattr(era5, '_retrieve', retrieve)
+    with pytest.raises(RuntimeError):
+        era5._submit_all(jobs)
+
+    assert era5.files == [filepaths[0], filepaths[2]]
+    cached = era5._lookup([_request_hash(dataset, request) for dataset, request, _ in jobs])
+    assert sorted(files[0] for files in cached.values()) == sorted([filepaths[0], filepaths[2]])
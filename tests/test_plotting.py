@@ -0,0 +1,72 @@
+import matplotlib
+matplotlib.use('Agg')
+
+import numpy as np
+
+from creampy import plotting
+
+
+def test_coarsen_block_means():
+    lons = np.arange(6.0)
+    lats = np.arange(4.0)
+    var = np.arange(24.0).reshape(4, 6)
+
+    clons, clats, cvar = plotting._coarsen(lons, lats, var, 2)
+
+    np.testing.assert_allclose(clons, [0.5, 2.5, 4.5])
+    np.testing.assert_allclose(clats, [0.5, 2.5])
+    np.testing.assert_allclose(cvar, var.reshape(2, 2, 3, 2).mean(axis = (1, 3)))
+
+
+def test_coarsen_drops_incomplete_blocks_and_ignores_nan():
+    lons = np.arange(5.0)
+    lats = np.arange(3.0)
+    var = np.ones((3, 5))
+    var[0, 0] = np.nan
+
+    clons, clats, cvar = plotting._coarsen(lons, lats, var, 2)
+
+    assert cvar.shape == (1, 2)
+    np.testing.assert_allclose(clons, [0.5, 2.5])
+    np.testing.assert_allclose(clats, [0.5])
+    np.testing.assert_allclose(cvar, 1.0)
+
+
+def _field():
+    lons = np.arange(70.0, 110.01, 1.0)
+    lats = np.arange(50.0, 29.99, -1.0)
+    lon2d, lat2d = np.meshgrid(lons, lats)
+    return lons, lats, np.sin(np.radians(lon2d) * 4) * np.cos(np.radians(lat2d) * 3) * 10
+
+
+def test_contour_image_matches_contourf_levels_and_colors():
+    lons, lats, var = _field()
+    cmap = plotting._CMAP_DEFAULT
+    vmin, vmax = np.nanmin(var), np.nanmax(var)
+
+    fig = plotting.plt.figure()
+    ax = fig.add_subplot(projection = plotting._PLATECARREE)
+    cs = ax.contourf(lons, lats, var, levels = 8, cmap = cmap, vmin = vmin, vmax = vmax)
+    m = plotting._contour_image(ax, lons, lats, var, 8, cmap, vmin, vmax)
+
+    # same contour levels and the same color for each interval
+    np.testing.assert_allclose(m.norm.boundaries, cs.levels)
+    np.testing.assert_allclose(m.cmap.colors, cmap(cs.norm(cs.layers)))
+    plotting.plt.close(fig)
+
+
+def test_contour_image_masks_values_outside_levels():
+    lons, lats, var = _field()
+    levels = np.linspace(-5, 5, 6)
+
+    fig = plotting.plt.figure()
+    ax = fig.add_subplot(projection = plotting._PLATECARREE)
+    m = plotting._contour_image(ax, lons, lats, var, levels, plotting._CMAP_DEFAULT, -5, 5)
+
+    data = m.get_array()
+    outside = (var < -5) | (var > 5)
+    assert outside.any()
+    # the image can be flipped to increasing latitudes, so only the number of masked cells is compared
+    assert np.ma.count_masked(data) == outside.sum()
+    assert len(m.cmap.colors) == len(levels) - 1
+    plotting.plt.close(fig)
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from creampy import utils
+
+# np.trapz was renamed to np.trapezoid in numpy 2.0
+trapezoid = getattr(np, 'trapezoid', None) or np.trapz
+
+
+def test_trapz_1d_coordinates():
+    rng = np.random.default_rng(0)
+    values = rng.random((7, 4, 5))
+    x = np.sort(rng.random(7))
+
+    np.testing.assert_allclose(utils._trapz(values, x, axis = 0), trapezoid(values, x, axis = 0))
+
+
+@pytest.mark.parametrize('axis', [0, 1, 2])
+def test_trapz_nd_coordinates(axis):
+    rng = np.random.default_rng(1)
+    values = rng.random((6, 5, 4))
+    x = np.cumsum(rng.random((6, 5, 4)), axis = axis)
+
+    np.testing.assert_allclose(utils._trapz(values, x, axis = axis), trapezoid(values, x, axis = axis))
+
+
+def test_trapz_two_points():
+    np.testing.assert_allclose(utils._trapz([1.0, 3.0], [0.0, 2.0]), 4.0)
+
+
+def test_trapz_single_point_is_zero():
+    values = np.ones((1, 3))
+    x = np.array([5.0])
+
+    np.testing.assert_array_equal(utils._trapz(values, x), trapezoid(values, x, axis = 0))
+    np.testing.assert_array_equal(utils._trapz(values, np.ones((1, 3))), np.zeros(3))
+
+
+def test_geopotential_to_height():
+    g = 9.80665
+    Re = 6.371e6
+    z = np.array([0.0, 5000.0 * g, 1e5])
+
+    np.testing.assert_allclose(utils.geopotential_to_height(z), z * Re / (g * Re - z))
+    np.testing.assert_allclose(utils.geopotential_to_height(1e5), 1e5 * Re / (g * Re - 1e5))
+
+
+def test_column_integration():
+    rng = np.random.default_rng(2)
+    values = rng.random((5, 3, 4))
+    z = np.cumsum(rng.random((5, 3, 4)), axis = 0) * 1e4
+
+    expected = trapezoid(values, utils.geopotential_to_height(z), axis = 0)
+    np.testing.assert_allclose(utils.column_integration(values, z), expected)